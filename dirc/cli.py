@@ -8,18 +8,20 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
-from .compiler import CompileOptions, compile_to_bash
-from .spec import SpecError, load_spec
+# The compiler and spec parser are imported inside the subcommands that need
+# them so `--help`, `init` and argparse errors stay cheap.
+from .errors import SpecError
 
 
 DEFAULT_SPEC_CANDIDATES = (".dirc", "dirc.dirc", "dirc.spec")
 
 
 def _find_default_spec(start: Path) -> Optional[Path]:
+    base = os.fspath(start)
     for name in DEFAULT_SPEC_CANDIDATES:
-        candidate = start / name
-        if candidate.is_file():
-            return candidate
+        candidate = os.path.join(base, name)
+        if os.path.isfile(candidate):
+            return Path(candidate)
     return None
 
 
@@ -31,7 +33,9 @@ class CommonArgs:
 
 
 def _parse_common_args(ns: argparse.Namespace) -> CommonArgs:
-    root = Path(ns.root).resolve()
+    # abspath is pure string work; resolve() would readlink every component and
+    # nothing downstream needs symlinks in the root resolved.
+    root = Path(os.path.abspath(ns.root))
 
     spec_path: Optional[Path]
     if ns.spec:
@@ -54,6 +58,9 @@ def _parse_common_args(ns: argparse.Namespace) -> CommonArgs:
 
 
 def _cmd_check(ns: argparse.Namespace) -> int:
+    from .compiler import CompileOptions, compile_to_bash
+    from .spec import load_spec
+
     common = _parse_common_args(ns)
     spec = load_spec(common.spec_path)
 
@@ -72,7 +79,29 @@ def _cmd_check(ns: argparse.Namespace) -> int:
     return int(proc.returncode)
 
 
+def _write_executable(path: Path, data: bytes) -> None:
+    if not hasattr(os, "fchmod"):
+        # Windows before Python 3.13 has no fchmod.
+        path.write_bytes(data)
+        os.chmod(path, 0o755)
+        return
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o755)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view) :]
+        # The open() mode is filtered by the umask and ignored for existing
+        # files, so set it explicitly on the already-open descriptor.
+        os.fchmod(fd, 0o755)
+    finally:
+        os.close(fd)
+
+
 def _cmd_compile(ns: argparse.Namespace) -> int:
+    from .compiler import CompileOptions, compile_to_bash
+    from .spec import load_spec
+
     common = _parse_common_args(ns)
     spec = load_spec(common.spec_path)
 
@@ -84,9 +113,7 @@ def _cmd_compile(ns: argparse.Namespace) -> int:
     script = compile_to_bash(spec, options=options, spec_basename=common.spec_path.name)
 
     if ns.out:
-        out_path = Path(ns.out)
-        out_path.write_text(script, encoding="utf-8")
-        os.chmod(out_path, 0o755)
+        _write_executable(Path(ns.out), script.encode("utf-8"))
     else:
         sys.stdout.write(script)
     return 0
@@ -114,7 +141,31 @@ def _cmd_init(ns: argparse.Namespace) -> int:
     return 0
 
 
+SUBCOMMANDS = {
+    "check": "Validate directory structure",
+    "compile": "Compile spec to a standalone Bash verifier",
+    "init": "Create a starter .dirc spec",
+}
+
+
+def _sniff_subcommand(argv: list[str]) -> Optional[str]:
+    # The top-level parser only takes -h/--help, so the first positional
+    # argument is the subcommand; anything after it belongs to the subparser.
+    # Top-level help describes every subcommand, so it needs all of them.
+    for arg in argv:
+        if arg in ("-h", "--help"):
+            return None
+        if arg.startswith("-"):
+            continue
+        return arg if arg in SUBCOMMANDS else None
+    return None
+
+
 def main(argv: Optional[list[str]] = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    wanted = _sniff_subcommand(argv)
+
     parser = argparse.ArgumentParser(prog="dirc", description="Directory structure linter")
     sub = parser.add_subparsers(dest="cmd", required=True)
 
@@ -138,18 +189,26 @@ def main(argv: Optional[list[str]] = None) -> int:
             help="Make the project root strict as well (by default only listed dirs are linted).",
         )
 
-    p_check = sub.add_parser("check", help="Validate directory structure")
-    add_common(p_check)
-    p_check.set_defaults(func=_cmd_check)
-
-    p_compile = sub.add_parser("compile", help="Compile spec to a standalone Bash verifier")
-    add_common(p_compile)
-    p_compile.add_argument("--out", help="Write script to this path (chmod +x). Default: stdout.")
-    p_compile.set_defaults(func=_cmd_compile)
-
-    p_init = sub.add_parser("init", help="Create a starter .dirc spec")
-    p_init.add_argument("--path", default=".dirc", help="Output path (default: .dirc)")
-    p_init.set_defaults(func=_cmd_init)
+    # Every subcommand is registered so top-level help and usage errors list
+    # all choices, but only the one that will run gets its arguments; without
+    # a recognised subcommand all of them are filled in.
+    subparsers = {name: sub.add_parser(name, help=text) for name, text in SUBCOMMANDS.items()}
+
+    if wanted in (None, "check"):
+        p_check = subparsers["check"]
+        add_common(p_check)
+        p_check.set_defaults(func=_cmd_check)
+
+    if wanted in (None, "compile"):
+        p_compile = subparsers["compile"]
+        add_common(p_compile)
+        p_compile.add_argument("--out", help="Write script to this path (chmod +x). Default: stdout.")
+        p_compile.set_defaults(func=_cmd_compile)
+
+    if wanted in (None, "init"):
+        p_init = subparsers["init"]
+        p_init.add_argument("--path", default=".dirc", help="Output path (default: .dirc)")
+        p_init.set_defaults(func=_cmd_init)
 
     args = parser.parse_args(argv)
     try:
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import re
 from dataclasses import dataclass
 
 from .spec import DirectoryRule, Spec, glob_has_magic
@@ -13,7 +14,21 @@ class CompileOptions:
 
 
 def _bash_quote(s: str) -> str:
-    return "'" + s.replace("'", "'\"'\"'") + "'"
+    if "'" not in s:
+        return "'" + s + "'"
+    return "'" + s.replace("'", "'\\''") + "'"
+
+
+# Characters that make an ignore entry a Bash pattern rather than a plain
+# basename (globs, extglob groups and backslash escapes).
+_PATTERN_CHARS = re.compile(r"[*?[(\\]")
+
+
+def _bash_assoc_set(name: str, items: list[str]) -> str:
+    if not items:
+        return f"declare -A {name}=()"
+    quoted = " ".join([f"[{_bash_quote(x)}]=1" for x in items])
+    return f"declare -A {name}=({quoted})"
 
 
 def _bash_array(name: str, items: list[str]) -> str:
@@ -22,224 +37,240 @@ def _bash_array(name: str, items: list[str]) -> str:
     quoted = " ".join([_bash_quote(x) for x in items])
     return f"{name}=({quoted})"
 
-@dataclass(frozen=True)
+@dataclass
 class _Node:
+    __slots__ = ("node_id", "rule", "children", "is_magic")
+
     node_id: int
     rule: DirectoryRule
     children: list["_Node"]
+    is_magic: bool
 
 
 def _build_nodes(rule: DirectoryRule) -> _Node:
+    # Iterative pre-order walk so deep specs don't hit the recursion limit;
+    # ids come out in the same order as a recursive walk would assign them.
+    top: list[_Node] = []
+    stack: list[tuple[DirectoryRule, list[_Node]]] = [(rule, top)]
     next_id = 1
-
-    def walk(r: DirectoryRule) -> _Node:
-        nonlocal next_id
-        node = _Node(node_id=next_id, rule=r, children=[])
+    while stack:
+        r, siblings = stack.pop()
+        node = _Node(node_id=next_id, rule=r, children=[], is_magic=glob_has_magic(r.name))
         next_id += 1
-        children = [walk(c) for c in r.subdirs]
-        object.__setattr__(node, "children", children)
-        return node
-
-    return walk(rule)
+        siblings.append(node)
+        stack.extend((c, node.children) for c in reversed(r.subdirs))
+    return top[0]
+
+
+_BASH_HEADER = """\
+#!/usr/bin/env bash
+set -euo pipefail
+if ((BASH_VERSINFO[0] * 100 + BASH_VERSINFO[1] < 404)); then
+  echo "dirc: bash 4.4+ required (found $BASH_VERSION)" >&2
+  exit 2
+fi
+shopt -s extglob nullglob dotglob
+
+"""
+
+
+_BASH_PRELUDE = """\
+fail() {
+  echo "dirc: $*" >&2
+  exit 1
+}
+
+matches_any() {
+  local name="$1"; shift
+  local pat
+  for pat in "$@"; do
+    [[ "$name" == $pat ]] && return 0
+  done
+  return 1
+}
+
+is_ignored() {
+  [[ -n "${IGNORE_LITERAL[$1]+x}" ]] && return 0
+  ((${#IGNORE_GLOBS[@]} == 0)) && return 1
+  matches_any "$1" "${IGNORE_GLOBS[@]}"
+}
+
+check_dir() {
+  local rel="$1"
+  local -n allowed_dirs="$2" allowed_files="$3" required_dirs="$4" required_files="$5"
+  local allow_extra="$6"
+
+  local path="$ROOT/$rel"
+  [[ -d "$path" ]] || fail "missing directory: $rel"
+
+  local req
+  for req in "${required_dirs[@]}"; do
+    [[ -d "$path/$req" ]] || fail "missing required directory: ${rel%/}/$req"
+  done
+
+  for req in "${required_files[@]}"; do
+    [[ -f "$path/$req" ]] || fail "missing required file: ${rel%/}/$req"
+  done
+
+  local entries=("$path"/*)
+
+  # Subdirectories seen here, so wildcard rules don't list and stat again.
+  FOUND_DIRS=()
+  local entry base
+  for entry in "${entries[@]}"; do
+    base="${entry##*/}"
+    is_ignored "$base" && continue
+
+    if [[ -d "$entry" ]]; then
+      FOUND_DIRS+=("$base")
+      if matches_any "$base" "${allowed_dirs[@]}"; then
+        :
+      elif [[ "$allow_extra" == "1" ]]; then
+        :
+      else
+        fail "unexpected directory: ${rel%/}/$base"
+      fi
+    else
+      if matches_any "$base" "${allowed_files[@]}"; then
+        :
+      elif [[ "$allow_extra" == "1" ]]; then
+        :
+      else
+        fail "unexpected file: ${rel%/}/$base"
+      fi
+    fi
+  done
+}
+"""
+
+
+_WILDCARD_LOOP_HEAD = """\
+  local base
+  for base in "${dirs[@]}"; do
+"""
 
 
 def compile_to_bash(spec: Spec, options: CompileOptions, spec_basename: str = ".dirc") -> str:
     lines: list[str] = []
-    lines.append("#!/usr/bin/env bash")
-    lines.append("set -euo pipefail")
-    lines.append("shopt -s extglob")
-    lines.append("")
-    lines.append('ROOT="${1:-.}"')
-    lines.append(f"ALLOW_EXTRA_EVERYWHERE={'1' if options.allow_extra_everywhere else '0'}")
-    lines.append(f"STRICT_ROOT={'1' if options.strict_root else '0'}")
-    lines.append(f"SPEC_BASENAME={_bash_quote(spec_basename)}")
-    lines.append("")
+    lines.append(
+        _BASH_HEADER
+        + 'ROOT="${1:-.}"\n'
+        f"ALLOW_EXTRA_EVERYWHERE={'1' if options.allow_extra_everywhere else '0'}\n"
+        f"STRICT_ROOT={'1' if options.strict_root else '0'}\n"
+        f"SPEC_BASENAME={_bash_quote(spec_basename)}\n"
+    )
 
+    # Keep the caller's order for emission but test membership against a set.
     ignore_items = list(options.ignore or [])
-    if ".git" not in ignore_items:
-        ignore_items.append(".git")
-    if spec_basename not in ignore_items:
-        ignore_items.append(spec_basename)
+    ignore_set = set(ignore_items)
+    for always in (".git", spec_basename):
+        if always not in ignore_set:
+            ignore_items.append(always)
+            ignore_set.add(always)
 
-    lines.append(_bash_array("IGNORE_BASENAMES", ignore_items))
-    lines.append("")
-
-    lines.append('if [[ "${1:-}" != "" ]] && [[ ! -d "$ROOT" ]]; then')
-    lines.append('  ROOT="."')
-    lines.append("fi")
-    lines.append("")
+    # An empty entry never matched anything as a pattern, and Bash rejects it
+    # as an associative-array key, so leave it out entirely.
+    ignore_literals = [x for x in ignore_items if x and not _PATTERN_CHARS.search(x)]
+    ignore_globs = [x for x in ignore_items if _PATTERN_CHARS.search(x)]
 
     lines.append(
-        "\n".join(
-            [
-                "fail() {",
-                '  echo "dirc: $*" >&2',
-                "  exit 1",
-                "}",
-                "",
-                "basename_safe() {",
-                "  local p=\"$1\"",
-                "  echo \"${p##*/}\"",
-                "}",
-                "",
-                "matches_any() {",
-                "  local name=\"$1\"; shift",
-                "  local pat",
-                "  for pat in \"$@\"; do",
-                "    [[ \"$name\" == $pat ]] && return 0",
-                "  done",
-                "  return 1",
-                "}",
-                "",
-                "is_ignored() {",
-                "  local base=\"$1\"",
-                "  matches_any \"$base\" \"${IGNORE_BASENAMES[@]}\"",
-                "}",
-                "",
-                "check_dir() {",
-                "  local rel=\"$1\"",
-                "  local allowed_dirs_var=\"$2\"",
-                "  local allowed_files_var=\"$3\"",
-                "  local required_dirs_var=\"$4\"",
-                "  local required_files_var=\"$5\"",
-                "  local allow_extra=\"$6\"",
-                "",
-                "  local path=\"$ROOT/$rel\"",
-                "  [[ -d \"$path\" ]] || fail \"missing directory: $rel\"",
-                "",
-                "  local allowed_dirs allowed_files required_dirs required_files",
-                "  eval \"allowed_dirs=(\\\"\\${${allowed_dirs_var}[@]}\\\")\"",
-                "  eval \"allowed_files=(\\\"\\${${allowed_files_var}[@]}\\\")\"",
-                "  eval \"required_dirs=(\\\"\\${${required_dirs_var}[@]}\\\")\"",
-                "  eval \"required_files=(\\\"\\${${required_files_var}[@]}\\\")\"",
-                "",
-                "  local req",
-                "  for req in \"${required_dirs[@]}\"; do",
-                "    [[ -d \"$path/$req\" ]] || fail \"missing required directory: ${rel%/}/$req\"",
-                "  done",
-                "",
-                "  for req in \"${required_files[@]}\"; do",
-                "    [[ -f \"$path/$req\" ]] || fail \"missing required file: ${rel%/}/$req\"",
-                "  done",
-                "",
-                "  shopt -s nullglob dotglob",
-                "  local entries=(\"$path\"/*)",
-                "  shopt -u dotglob",
-                "",
-                "  local entry base",
-                "  for entry in \"${entries[@]}\"; do",
-                "    base=\"$(basename_safe \"$entry\")\"",
-                "    is_ignored \"$base\" && continue",
-                "",
-                "    if [[ -d \"$entry\" ]]; then",
-                "      if matches_any \"$base\" \"${allowed_dirs[@]}\"; then",
-                "        :",
-                "      elif [[ \"$allow_extra\" == \"1\" ]]; then",
-                "        :",
-                "      else",
-                "        fail \"unexpected directory: ${rel%/}/$base\"",
-                "      fi",
-                "    else",
-                "      if matches_any \"$base\" \"${allowed_files[@]}\"; then",
-                "        :",
-                "      elif [[ \"$allow_extra\" == \"1\" ]]; then",
-                "        :",
-                "      else",
-                "        fail \"unexpected file: ${rel%/}/$base\"",
-                "      fi",
-                "    fi",
-                "  done",
-                "}",
-                "",
-            ]
-        )
+        f"{_bash_assoc_set('IGNORE_LITERAL', ignore_literals)}\n"
+        f"{_bash_array('IGNORE_GLOBS', ignore_globs)}\n"
+        "\n"
+        'if [[ "${1:-}" != "" ]] && [[ ! -d "$ROOT" ]]; then\n'
+        '  ROOT="."\n'
+        "fi\n"
     )
 
+    lines.append(_BASH_PRELUDE)
+
     root_node = _build_nodes(spec.root)
 
     def func_name(node_id: int) -> str:
         return f"rule_{node_id}"
 
+    # Sibling scaffolds often repeat the same name lists; declare each distinct
+    # (kind, items) array once and point later rules at the existing variable.
+    array_cache: dict[tuple[str, tuple[str, ...]], str] = {}
+
+    def shared_array(prefix: str, node_id: int, items: list[str], decls: list[str]) -> str:
+        key = (prefix, tuple(items))
+        var = array_cache.get(key)
+        if var is None:
+            var = f"{prefix}_{node_id}"
+            array_cache[key] = var
+            decls.append(f"{_bash_array(var, items)}\n")
+        return var
+
     def compile_node(node: _Node) -> None:
         node_id = node.node_id
         rule = node.rule
 
-        allowed_dirs = [c.rule.name for c in node.children]
+        allowed_dirs: list[str] = []
+        required_dirs: list[str] = []
+        literal_children: list[_Node] = []
+        wildcard_children: list[_Node] = []
+        for c in node.children:
+            allowed_dirs.append(c.rule.name)
+            if c.is_magic:
+                wildcard_children.append(c)
+            else:
+                literal_children.append(c)
+                required_dirs.append(c.rule.name)
         allowed_files = list(rule.file_patterns) + list(rule.required_files)
-        required_dirs = [c.rule.name for c in node.children if not glob_has_magic(c.rule.name)]
         required_files = list(rule.required_files)
 
-        allow_dirs_var = f"ALLOWED_DIRS_{node_id}"
-        allow_files_var = f"ALLOWED_FILES_{node_id}"
-        req_dirs_var = f"REQUIRED_DIRS_{node_id}"
-        req_files_var = f"REQUIRED_FILES_{node_id}"
+        decls: list[str] = []
+        allow_dirs_var = shared_array("ALLOWED_DIRS", node_id, allowed_dirs, decls)
+        allow_files_var = shared_array("ALLOWED_FILES", node_id, allowed_files, decls)
+        req_dirs_var = shared_array("REQUIRED_DIRS", node_id, required_dirs, decls)
+        req_files_var = shared_array("REQUIRED_FILES", node_id, required_files, decls)
 
-        lines.append(_bash_array(allow_dirs_var, allowed_dirs))
-        lines.append(_bash_array(allow_files_var, allowed_files))
-        lines.append(_bash_array(req_dirs_var, required_dirs))
-        lines.append(_bash_array(req_files_var, required_files))
-        lines.append("")
+        calls = "".join(
+            f"  {func_name(c.node_id)} \"${{rel%/}}/{c.rule.name}\"\n" for c in literal_children
+        )
 
-        lines.append(f"{func_name(node_id)}() {{")
-        lines.append("  local rel=\"$1\"")
+        keep_dirs = ""
+        wildcard = ""
+        if wildcard_children:
+            # Copy before literal children run check_dir and reset FOUND_DIRS.
+            keep_dirs = "  local dirs=(\"${FOUND_DIRS[@]}\")\n"
+            skip_literals = ""
+            if literal_children:
+                skip_literals = (
+                    "    case \"$base\" in\n"
+                    + "".join(f"      {_bash_quote(c.rule.name)}) continue ;;\n" for c in literal_children)
+                    + "    esac\n"
+                )
+            branches = "".join(
+                f"    if [[ \"$base\" == {c.rule.name} ]]; then\n"
+                "      if [[ \"$matched\" == \"1\" ]]; then\n"
+                "        fail \"ambiguous directory rule for: ${rel%/}/$base\"\n"
+                "      fi\n"
+                "      matched=1\n"
+                f"      {func_name(c.node_id)} \"${{rel%/}}/$base\"\n"
+                "    fi\n"
+                for c in wildcard_children
+            )
+            wildcard = _WILDCARD_LOOP_HEAD + skip_literals + "    local matched=0\n" + branches + "  done\n"
 
-        lines.append("  local allow_extra=0")
-        lines.append(
-            "  if [[ \"$ALLOW_EXTRA_EVERYWHERE\" == \"1\" ]] || ([[ \"$rel\" == \".\" ]] && [[ \"$STRICT_ROOT\" != \"1\" ]]); then allow_extra=1; fi"
-        )
         lines.append(
-            f"  check_dir \"$rel\" {allow_dirs_var} {allow_files_var} {req_dirs_var} {req_files_var} \"$allow_extra\""
+            f"{''.join(decls)}\n"
+            f"{func_name(node_id)}() {{\n"
+            "  local rel=\"$1\"\n"
+            "  local allow_extra=0\n"
+            "  if [[ \"$ALLOW_EXTRA_EVERYWHERE\" == \"1\" ]] || ([[ \"$rel\" == \".\" ]] && [[ \"$STRICT_ROOT\" != \"1\" ]]); then allow_extra=1; fi\n"
+            f"  check_dir \"$rel\" {allow_dirs_var} {allow_files_var} {req_dirs_var} {req_files_var} \"$allow_extra\"\n"
+            f"{keep_dirs}{calls}{wildcard}}}\n"
         )
 
-        literal_children = [c for c in node.children if not glob_has_magic(c.rule.name)]
-        wildcard_children = [c for c in node.children if glob_has_magic(c.rule.name)]
+    # Emit in pre-order with an explicit stack; deep specs would otherwise
+    # recurse once per directory rule.
+    stack = [root_node]
+    while stack:
+        node = stack.pop()
+        compile_node(node)
+        stack.extend(reversed(node.children))
 
-        if literal_children:
-            for child in literal_children:
-                child_name = child.rule.name
-                lines.append(f"  {func_name(child.node_id)} \"${{rel%/}}/{child_name}\"")
-
-        if wildcard_children:
-            lines.append("  local path=\"$ROOT/$rel\"")
-            lines.append("  shopt -s nullglob dotglob")
-            lines.append("  local dirs=(\"$path\"/*)")
-            lines.append("  shopt -u dotglob")
-            lines.append("  local entry base")
-            lines.append("  for entry in \"${dirs[@]}\"; do")
-            lines.append("    [[ -d \"$entry\" ]] || continue")
-            lines.append("    base=\"$(basename_safe \"$entry\")\"")
-            lines.append("    is_ignored \"$base\" && continue")
-
-            literal_names = [c.rule.name for c in literal_children]
-            if literal_names:
-                lines.append("    case \"$base\" in")
-                for name in literal_names:
-                    lines.append(f"      {_bash_quote(name)}) continue ;;")
-                lines.append("    esac")
-
-            lines.append("    local matched=0")
-            for child in wildcard_children:
-                pat = child.rule.name
-                lines.append(f"    if [[ \"$base\" == {pat} ]]; then")
-                lines.append("      if [[ \"$matched\" == \"1\" ]]; then")
-                lines.append("        fail \"ambiguous directory rule for: ${rel%/}/$base\"")
-                lines.append("      fi")
-                lines.append("      matched=1")
-                lines.append(f"      {func_name(child.node_id)} \"${{rel%/}}/$base\"")
-                lines.append("    fi")
-            lines.append("  done")
-
-        lines.append("}")
-        lines.append("")
-
-        for child in node.children:
-            compile_node(child)
-
-    compile_node(root_node)
-
-    lines.append(f"{func_name(root_node.node_id)} \".\"")
-    lines.append("")
-
-    lines.append('echo "dirc: ok"')
-    lines.append("")
+    lines.append(f"{func_name(root_node.node_id)} \".\"\n\necho \"dirc: ok\"\n")
     return "\n".join(lines)
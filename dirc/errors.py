@@ -0,0 +1,5 @@
+from __future__ import annotations
+
+
+class SpecError(RuntimeError):
+    pass
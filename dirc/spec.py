@@ -1,17 +1,21 @@
 from __future__ import annotations
 
 import re
+import sys
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional
 
-
-class SpecError(RuntimeError):
-    pass
+from .errors import SpecError
 
 
 _GLOB_MAGIC = re.compile(r"[*?[]")
-_EXT_SHORTHAND = re.compile(r"^\.[A-Za-z0-9]{1,5}$")
+# Extension shorthand like ".png", or any glob/brace character.
+_FILE_HINT = re.compile(r"^\.[A-Za-z0-9]{1,5}$|[*?\[{]")
+_WS_RE = re.compile(r"\s+")
+_BRACE_RE = re.compile(r"\{([^}]+)\}")
+_INLINE_COMMENT = re.compile(r"\s#")
+_TABSIZE = 4
 
 
 def glob_has_magic(s: str) -> bool:
@@ -19,36 +23,28 @@ def glob_has_magic(s: str) -> bool:
 
 
 def _is_file_pattern(token: str) -> bool:
-    token = token.strip()
-    return (
-        bool(_EXT_SHORTHAND.match(token))
-        or "*" in token
-        or "?" in token
-        or "[" in token
-        or "{" in token
-    )
+    return bool(_FILE_HINT.search(token.strip()))
 
 
 def _normalize_pattern(raw: str) -> str:
-    s = re.sub(r"\s+", "", raw.strip())
+    s = _WS_RE.sub("", raw.strip())
     if s == "*.*":
         return "*"
     if s.startswith(".") and "/" not in s:
         return f"*{s}"
     if "{" in s and "}" in s:
-        s = re.sub(
-            r"\{([^}]+)\}",
+        s = _BRACE_RE.sub(
             lambda m: "@(" + "|".join([p for p in m.group(1).split(",") if p]) + ")",
             s,
         )
     return s
 
 
-def _expand_tabs(line: str, tabsize: int = 4) -> str:
-    return line.expandtabs(tabsize)
+# dataclass(slots=True) only exists on Python 3.10+; 3.9 keeps per-instance dicts.
+_DATACLASS_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class DirectoryRule:
     name: str
     subdirs: list["DirectoryRule"] = field(default_factory=list)
@@ -56,7 +52,7 @@ class DirectoryRule:
     required_files: list[str] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class Spec:
     root: DirectoryRule
 
@@ -66,43 +62,35 @@ def load_spec(path: Path) -> Spec:
     return parse_spec(text, source=str(path))
 
 
+def _tokenize(text: str) -> list[tuple[int, int, str]]:
+    # (line number, indent, content) for every line that isn't blank or a comment.
+    entries: list[tuple[int, int, str]] = []
+    for idx, raw in enumerate(text.splitlines(), start=1):
+        expanded = raw.expandtabs(_TABSIZE)
+        content = expanded.lstrip(" ")
+        if not content or content[0] == "#":
+            continue
+        indent = len(expanded) - len(content)
+        # Inline comments start at a '#' preceded by whitespace.
+        m = _INLINE_COMMENT.search(content)
+        if m is not None:
+            content = content[: m.start()]
+        content = content.strip()
+        if not content:
+            continue
+        entries.append((idx, indent, content))
+    return entries
+
+
 def parse_spec(text: str, source: str = "<spec>") -> Spec:
     root = DirectoryRule(name=".")
     stack: list[DirectoryRule] = [root]
     indent_unit: Optional[int] = None
     last_was_file_at_level: Optional[int] = None
 
-    raw_lines = text.splitlines()
-
-    def next_nonempty_line(i: int) -> Optional[Tuple[int, str]]:
-        for j in range(i + 1, len(raw_lines)):
-            candidate = raw_lines[j]
-            if not candidate.strip():
-                continue
-            if candidate.lstrip().startswith("#"):
-                continue
-            return j, candidate
-        return None
-
-    for idx0, raw in enumerate(raw_lines):
-        idx = idx0 + 1
-        if not raw.strip():
-            continue
-        stripped = raw.lstrip()
-        if stripped.startswith("#"):
-            continue
-
-        expanded = _expand_tabs(raw)
-        indent = len(expanded) - len(expanded.lstrip(" "))
-        content_raw = expanded[indent:].rstrip()
-        for j, ch in enumerate(content_raw):
-            if ch == "#" and (j == 0 or content_raw[j - 1].isspace()):
-                content_raw = content_raw[:j].rstrip()
-                break
-        if not content_raw:
-            continue
-        content = content_raw.strip()
+    entries = _tokenize(text)
 
+    for pos, (idx, indent, content) in enumerate(entries):
         if indent == 0:
             level = 0
         else:
@@ -132,11 +120,9 @@ def parse_spec(text: str, source: str = "<spec>") -> Spec:
         if dir_forced:
             content = content[:-1]
 
-        nxt = next_nonempty_line(idx0)
         has_children = False
-        if nxt is not None:
-            nxt_expanded = _expand_tabs(nxt[1])
-            nxt_indent = len(nxt_expanded) - len(nxt_expanded.lstrip(" "))
+        if pos + 1 < len(entries):
+            nxt_indent = entries[pos + 1][1]
             if indent_unit is None:
                 has_children = nxt_indent > indent
             else: